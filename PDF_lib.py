@@ -5,8 +5,21 @@ import pypdf
 from PIL import Image
 import io
 import datetime
+import functools
+import gc
 import json
+import hashlib
+import shutil
+import tempfile
 import re # For cleaning pypdf visitor output
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+# Cleanup patterns for the pypdf visitor output
+_WS_RUN = re.compile(r'[^\S\n]{2,}')
+_BLANK_RUN = re.compile(r'(?:\n[^\S\n]*){3,}')
+# Non-breaking and typographic spaces folded to a plain space. Only whitespace is touched:
+# full-text NFKC would also rewrite content such as superscripts in units (cm⁻¹ -> cm-1).
+_SPACE_VARIANTS = str.maketrans({cp: ' ' for cp in (0x00A0, 0x1680, *range(0x2000, 0x200B), 0x202F, 0x205F, 0x3000)})
 
 # --- Optional Imports (handle gracefully if libraries not installed) ---
 try:
@@ -24,6 +37,12 @@ except ImportError:
     UNSTRUCTURED_AVAILABLE = False
     print("Warning: unstructured not found. Unstructured methods will be unavailable.")
 
+try:
+    from unstructured.partition.image import partition_image
+    UNSTRUCTURED_IMAGE_AVAILABLE = True
+except ImportError:
+    UNSTRUCTURED_IMAGE_AVAILABLE = False
+
 # pypdfium2 might be used by pdf2image or pymupdf4llm internally
 try:
     import pypdfium2
@@ -35,10 +54,24 @@ except ImportError:
 try:
     from pymupdf4llm import to_markdown as pymupdf4llm_to_markdown
     PYMUPDF4LLM_AVAILABLE = True
+    try:
+        # Not exported in layout mode (pymupdf-layout installed), where to_markdown ignores hdr_info
+        from pymupdf4llm import IdentifyHeaders as Pymupdf4llmIdentifyHeaders
+        PYMUPDF4LLM_HDR_INFO_AVAILABLE = True
+    except ImportError:
+        PYMUPDF4LLM_HDR_INFO_AVAILABLE = False
 except ImportError:
+    PYMUPDF4LLM_HDR_INFO_AVAILABLE = False
     PYMUPDF4LLM_AVAILABLE = False
     print("Warning: pymupdf4llm not found. pymupdf4llm method will be unavailable.")
 
+# --- orjson Import (faster summary serialization; falls back to json) ---
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # --- NEW: AlcheMark AI Import ---
 try:
     from alchemark_ai import pdf2md as alchemark_pdf2md
@@ -52,50 +85,220 @@ except ImportError:
 
 # --- Existing Extraction Functions ---
 
-def extract_text_pypdf(pdf_path):
-    """Extracts text using the pypdf library."""
-    text = ""
+def _pypdf_extract_impl(reader, page_break=True):
+    """
+    Extracts and cleans the text of every page of a pypdf reader via the visitor callback.
+    Line breaks follow pypdf's own newline runs and baseline changes, as in page.extract_text().
+    With page_break=False pages are separated by a plain newline instead of a marker.
+    """
+    # Visitor fires for every text run; append encoded bytes and decode once at the end
+    buf = bytearray()
+    state = {"y": None}
+
+    def end_line():
+        if not buf or buf[-1] == 0x0A:
+            return
+        if buf[-1] == 0x20:
+            buf[-1] = 0x0A
+        else:
+            buf.append(0x0A)
+
+    def visitor_body(text, cm, tm, fontDict, fontSize):
+        if not text:
+            return
+        if not text.strip():
+            # pypdf reports line ends as bare "\n" runs (with a zeroed matrix, so no usable y)
+            if "\n" in text:
+                end_line()
+            return
+        # Baseline of this run in device space: y of the text matrix combined with the CTM
+        y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+        tolerance = max(1.0, 0.5 * (fontSize or 0) * abs(tm[3] * cm[3]))
+        if state["y"] is not None and abs(y - state["y"]) > tolerance:
+            end_line()
+        state["y"] = y
+        buf.extend(text.encode('utf-8'))
+        if text.endswith("\n"):
+            state["y"] = None
+        else:
+            buf.append(0x20)
+
+    for i, page in enumerate(reader.pages):
+         state["y"] = None
+         try:
+             page.extract_text(visitor_text=visitor_body)
+             if page_break:
+                 buf.extend(b"\n--- Page Break ---\n")
+             else:
+                 end_line()
+         except Exception as e_page:
+             print(f"Error processing page {i+1} with pypdf visitor: {e_page}")
+             buf.extend(f"\n[Error on Page {i+1}]\n".encode('utf-8'))
+    # Fold non-breaking and typographic spaces first so the whitespace regexes see plain spaces
+    cleaned_text = buf.decode('utf-8').translate(_SPACE_VARIANTS)
+    cleaned_text = _WS_RUN.sub(' ', cleaned_text)
+    cleaned_text = _BLANK_RUN.sub('\n\n', cleaned_text).strip()
+    return cleaned_text
+
+# Fewer characters than this on the first two pages means the PDF has no usable text layer (scanned)
+IMAGE_ONLY_MIN_CHARS = 20
+
+def _looks_image_only(probe_text):
+    return len(probe_text.strip()) < IMAGE_ONLY_MIN_CHARS
+
+def extract_text_pypdf(pdf_path, pdf_bytes=None):
+    """
+    Extracts text using the pypdf library. Parses pdf_bytes in memory when given.
+    Returns None without a full pass if the first pages have no text layer (image-only PDF).
+    """
     try:
-        reader = pypdf.PdfReader(pdf_path)
-        for page in reader.pages:
-            text += page.extract_text() or ""
+        reader = pypdf.PdfReader(io.BytesIO(pdf_bytes) if pdf_bytes is not None else pdf_path, strict=False)
+        pages = reader.pages
+        probe_last = min(2, len(pages)) - 1
+        parts = []
+        for i, page in enumerate(pages):
+            parts.append(page.extract_text() or "")
+            # The first two pages double as the image-only probe, so nothing is extracted twice
+            if i == probe_last and _looks_image_only("".join(parts)):
+                print(f"Info: {pdf_path} appears to be image-only; skipping pypdf extraction (use OCR).")
+                return None
+        # Newline between pages so the last line of one page does not run into the next
+        return "\n".join(parts)
     except Exception as e:
         print(f"Error processing {pdf_path} with pypdf: {e}")
         return None
+
+@functools.lru_cache(maxsize=4)
+def _open_doc_bytes(path, mtime):
+    """Reads the PDF once per (path, mtime); mtime is part of the key so edited files are re-read."""
+    with open(path, 'rb') as f:
+        return f.read()
+
+def _open_fitz(pdf_path, pdf_bytes=None):
+    """Opens a fitz.Document from pdf_bytes, or from the cached PDF bytes, instead of the filesystem path."""
+    if pdf_bytes is None:
+        pdf_bytes = _open_doc_bytes(pdf_path, os.path.getmtime(pdf_path))
+    return fitz.open(stream=pdf_bytes, filetype='pdf')
+
+# Below this page count (or on a single CPU) spawning workers and reopening the
+# document per process costs more than extracting the pages sequentially
+PYMUPDF_PARALLEL_MIN_PAGES = 100
+
+# Dehyphenate and keep whitespace as-is; image and ligature handling are left off
+PYMUPDF_TEXT_FLAGS = fitz.TEXT_DEHYPHENATE | fitz.TEXT_PRESERVE_WHITESPACE
+
+def _pymupdf_page_text(page):
+    """
+    Returns a page's text in reading order (MuPDF sorts blocks by y/x internally).
+    sort=True drops the trailing newline plain get_text() has, so it is restored here;
+    otherwise joined pages would run the last line of one page into the next.
+    """
+    text = page.get_text("text", sort=True, flags=PYMUPDF_TEXT_FLAGS)
+    if text and not text.endswith("\n"):
+        text += "\n"
     return text
 
-def extract_text_pymupdf(pdf_path):
-    """Extracts text using the PyMuPDF (fitz) library."""
-    text = ""
+def _extract_page(args):
+    """Extracts the text of one page with PyMuPDF. Top-level so it can run in a worker process."""
+    path, i = args
+    d = _open_fitz(path)
+    t = _pymupdf_page_text(d[i])
+    d.close()
+    return i, t
+
+def _pymupdf_probe_text(doc):
+    """Returns the text of the first (up to) two pages, used to detect image-only PDFs."""
+    return "".join(_pymupdf_page_text(doc[i]) or "" for i in range(min(2, doc.page_count)))
+
+def extract_text_pymupdf(pdf_path, pdf_bytes=None):
+    """
+    Extracts text using the PyMuPDF (fitz) library. Parses pdf_bytes in memory when given.
+    Returns None without a full pass if the first pages have no text layer (image-only PDF).
+    """
+    parts = []
     try:
-        doc = fitz.open(pdf_path)
-        for page in doc:
-            text += page.get_text() or ""
+        doc = _open_fitz(pdf_path, pdf_bytes)
+        if _looks_image_only(_pymupdf_probe_text(doc)):
+            doc.close()
+            print(f"Info: {pdf_path} appears to be image-only; skipping PyMuPDF extraction (use OCR).")
+            return None
+        n = doc.page_count
+        if n < PYMUPDF_PARALLEL_MIN_PAGES or (os.cpu_count() or 1) <= 1:
+            for page in doc:
+                parts.append(_pymupdf_page_text(page) or "")
+            doc.close()
+            return "".join(parts)
         doc.close()
+        with ProcessPoolExecutor(max_workers=min(6, os.cpu_count() or 1)) as ex:
+            page_texts = sorted(ex.map(_extract_page, [(pdf_path, i) for i in range(n)], chunksize=4))
+        for _, page_text in page_texts:
+            parts.append(page_text or "")
     except Exception as e:
         print(f"Error processing {pdf_path} with PyMuPDF: {e}")
         return None
-    return text
+    return "".join(parts)
+
+# Returned by _ocr_page when the Tesseract binary itself is missing
+_TESSERACT_NOT_FOUND = "__TESSERACT_NOT_FOUND__"
+
+def _limit_ocr_threads():
+    """Pool initializer: one OpenMP thread per tesseract process, since parallelism comes from the pool."""
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+def _ocr_page(args):
+    """OCRs a single rendered page image. Top-level so it can run in a worker process."""
+    i, image_path = args
+    try:
+        return pytesseract.image_to_string(image_path)
+    except pytesseract.TesseractNotFoundError:
+        return _TESSERACT_NOT_FOUND
+    except Exception as e_ocr:
+        print(f"Error during OCR on page {i+1}: {e_ocr}")
+        return f"[OCR Error on page {i+1}]"
+
+# Render resolution for OCR; 150 DPI is enough for Tesseract on body text and much cheaper than 200
+OCR_DPI = 150
 
-def extract_text_ocr(pdf_path):
-    """Extracts text using Tesseract OCR via pdf2image and pytesseract."""
+def _render_pdf_pages(pdf_path, output_folder):
+    """
+    Renders every page of the PDF into output_folder and returns the image paths in page order.
+    Grayscale JPEGs are a fraction of the size of colour PPM/PNG pages and Tesseract handles them faster.
+    """
+    return convert_from_path(
+        pdf_path, # Add poppler_path if needed
+        dpi=OCR_DPI,
+        thread_count=os.cpu_count() or 1,
+        output_folder=output_folder,
+        fmt='jpeg',
+        grayscale=True,
+        paths_only=True,
+    )
+
+def extract_text_ocr(pdf_path, images=None, max_workers=None):
+    """
+    Extracts text using Tesseract OCR via pdf2image and pytesseract.
+    images: optional list of already rendered page image paths; the PDF is rendered here otherwise.
+    max_workers: OCR processes to use; defaults to all but one CPU. Each tesseract process is
+    limited to one OpenMP thread, so the pool size is the total OCR thread count.
+    """
     if not PYTESSERACT_AVAILABLE:
         print("OCR method skipped: pytesseract or pdf2image not available.")
         return None
-    text = ""
+    parts = []
+    n_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
     try:
-        images = convert_from_path(pdf_path) # Add poppler_path if needed
-        for i, img in enumerate(images):
-            try:
-                page_text = pytesseract.image_to_string(img)
-                text += page_text + "\n"
-            except pytesseract.TesseractNotFoundError:
-                 print("Error: Tesseract executable not found or not in PATH.")
-                 print("Ensure Tesseract is installed and its directory is in your system's PATH environment variable.")
-                 return None
-            except Exception as e_ocr:
-                 print(f"Error during OCR on page {i+1}: {e_ocr}")
-                 text += f"[OCR Error on page {i+1}]\n"
+        # Render pages to disk instead of keeping every page image in memory
+        with tempfile.TemporaryDirectory() as tmp:
+            image_paths = images if images is not None else _render_pdf_pages(pdf_path, tmp)
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=_limit_ocr_threads) as ex:
+                page_texts = list(ex.map(_ocr_page, enumerate(image_paths)))
+        if _TESSERACT_NOT_FOUND in page_texts:
+            print("Error: Tesseract executable not found or not in PATH.")
+            print("Ensure Tesseract is installed and its directory is in your system's PATH environment variable.")
+            return None
+        for page_text in page_texts:
+            parts.append(page_text or "")
+            parts.append("\n")
     except Exception as e:
         if "PDFInfoNotInstalledError" in str(e) or "pdfinfo" in str(e).lower():
              print(f"Error converting PDF: Poppler tools (like pdfinfo) not found or not in PATH.")
@@ -105,22 +308,74 @@ def extract_text_ocr(pdf_path):
         else:
             print(f"Error converting PDF to images or during OCR processing for {pdf_path}: {e}")
         return None
-    return text
+    return "".join(parts)
 
-def extract_text_unstructured(pdf_path, strategy="fast"):
-    """Extracts text using the unstructured library."""
+# Pages handed to partition_pdf at a time, so only one slice's elements are held in memory
+UNSTRUCTURED_SLICE_PAGES = 10
+
+def _write_pdf_slice(src_doc, start, stop, path):
+    """Writes pages [start, stop) of an open fitz.Document to a new PDF at path."""
+    part = fitz.open()
+    try:
+        part.insert_pdf(src_doc, from_page=start, to_page=stop - 1)
+        part.save(path)
+    finally:
+        part.close()
+
+def extract_text_unstructured(pdf_path, strategy="fast", images=None):
+    """
+    Extracts text using the unstructured library.
+    Long PDFs are partitioned in UNSTRUCTURED_SLICE_PAGES-page slices to bound peak memory.
+    images: optional list of already rendered page image paths, partitioned per page with
+    partition_image instead of re-rendering the PDF inside partition_pdf.
+    """
     if not UNSTRUCTURED_AVAILABLE:
         print("Unstructured method skipped: library not available.")
         return None
-    text = ""
+    parts = []
     try:
         print(f"Running unstructured with strategy='{strategy}'...")
-        elements = partition_pdf(
-             filename=pdf_path,
-             strategy=strategy,
-             infer_table_structure=True,
-             )
-        text = "\n\n".join([str(el) for el in elements])
+        if images is not None and UNSTRUCTURED_IMAGE_AVAILABLE:
+            for image_path in images:
+                elements = partition_image(
+                     filename=image_path,
+                     strategy=strategy,
+                     infer_table_structure=True,
+                     )
+                parts.extend(str(el) for el in elements)
+                del elements
+        else:
+            # Open from disk: the lru_cached _open_fitz bytes would pin the whole PDF in this worker
+            doc = fitz.open(pdf_path)
+            n = doc.page_count
+            try:
+                if n <= UNSTRUCTURED_SLICE_PAGES:
+                    elements = partition_pdf(
+                         filename=pdf_path,
+                         strategy=strategy,
+                         infer_table_structure=True,
+                         )
+                    parts.extend(str(el) for el in elements)
+                    del elements
+                else:
+                    # partition_pdf has no page-range option, so feed it one sub-PDF per slice
+                    with tempfile.TemporaryDirectory() as tmp:
+                        for start in range(0, n, UNSTRUCTURED_SLICE_PAGES):
+                            slice_path = os.path.join(tmp, f"pages_{start + 1}.pdf")
+                            _write_pdf_slice(doc, start, min(start + UNSTRUCTURED_SLICE_PAGES, n), slice_path)
+                            elements = partition_pdf(
+                                 filename=slice_path,
+                                 strategy=strategy,
+                                 infer_table_structure=True,
+                                 starting_page_number=start + 1,
+                                 )
+                            parts.extend(str(el) for el in elements)
+                            del elements
+                            gc.collect()
+                            os.remove(slice_path)
+            finally:
+                doc.close()
+        text = "\n\n".join(parts)
     except ImportError as e:
          print(f"ImportError with unstructured (check dependencies for strategy '{strategy}'): {e}")
          return None
@@ -133,40 +388,56 @@ def extract_text_unstructured(pdf_path, strategy="fast"):
         return None
     return text
 
-def extract_markdown_pymupdf4llm(pdf_path):
-    """Extracts Markdown using the pymupdf4llm library."""
+# Pages per pymupdf4llm worker task; documents of at most this many pages are converted in one call.
+# Chunking needs header levels computed over the whole document (hdr_info), so it is only used when
+# pymupdf4llm supports that; layout mode always converts in one call.
+PYMUPDF4LLM_CHUNK_PAGES = 10
+
+def _pymupdf4llm_chunk(args):
+    """Converts one page range to Markdown. Top-level so it can run in a worker process."""
+    path, pages, hdr_info = args
+    doc = _open_fitz(path)
+    try:
+        return pymupdf4llm_to_markdown(doc, pages=pages, hdr_info=hdr_info)
+    finally:
+        doc.close()
+
+def extract_markdown_pymupdf4llm(pdf_path, pdf_bytes=None):
+    """Extracts Markdown using the pymupdf4llm library. Parses pdf_bytes in memory when given."""
     if not PYMUPDF4LLM_AVAILABLE:
         print("pymupdf4llm method skipped: library not available.")
         return None
     print("Running pymupdf4llm extraction...")
     try:
-        markdown_output = pymupdf4llm_to_markdown(pdf_path)
-        return markdown_output
+        doc = _open_fitz(pdf_path, pdf_bytes)
+        n = doc.page_count
+        if n <= PYMUPDF4LLM_CHUNK_PAGES or not PYMUPDF4LLM_HDR_INFO_AVAILABLE:
+            try:
+                markdown_output = pymupdf4llm_to_markdown(doc)
+            finally:
+                doc.close()
+            return markdown_output
+        try:
+            # Font-size statistics over all pages, so every chunk assigns the same heading levels
+            hdr_info = Pymupdf4llmIdentifyHeaders(doc)
+        finally:
+            doc.close()
+        chunks = [list(range(i, min(i + PYMUPDF4LLM_CHUNK_PAGES, n))) for i in range(0, n, PYMUPDF4LLM_CHUNK_PAGES)]
+        # Workers re-open the file by path; ex.map keeps the chunks in page order
+        with ProcessPoolExecutor(max_workers=min(len(chunks), os.cpu_count() or 1)) as ex:
+            return "".join(ex.map(_pymupdf4llm_chunk, [(pdf_path, c, hdr_info) for c in chunks]))
     except Exception as e:
         print(f"Error processing {pdf_path} with pymupdf4llm: {e}")
         import traceback
         traceback.print_exc()
         return None
 
-def extract_text_pypdf_visitor(pdf_path):
+def extract_text_pypdf_visitor(pdf_path, pdf_bytes=None):
     """Extracts text using pypdf's visitor pattern for potentially more control."""
-    extracted_data = {"text": ""}
-    def visitor_body(text, cm, tm, fontDict, fontSize):
-        if text and text.strip():
-             extracted_data["text"] += text + " "
     print("Running pypdf visitor pattern extraction...")
     try:
-        reader = pypdf.PdfReader(pdf_path)
-        for i, page in enumerate(reader.pages):
-             try:
-                 page.extract_text(visitor_text=visitor_body)
-                 extracted_data["text"] += "\n--- Page Break ---\n"
-             except Exception as e_page:
-                 print(f"Error processing page {i+1} with pypdf visitor: {e_page}")
-                 extracted_data["text"] += f"\n[Error on Page {i+1}]\n"
-        cleaned_text = re.sub(r'\s{2,}', ' ', extracted_data["text"])
-        cleaned_text = re.sub(r'(\n\s*){2,}', '\n\n', cleaned_text).strip()
-        return cleaned_text
+        reader = pypdf.PdfReader(io.BytesIO(pdf_bytes) if pdf_bytes is not None else pdf_path, strict=False)
+        return _pypdf_extract_impl(reader, page_break=True)
     except pypdf.errors.PdfReadError as e_read:
         print(f"Error reading PDF {pdf_path} with pypdf: {e_read}")
         return None
@@ -187,7 +458,6 @@ def extract_markdown_alchemark(pdf_path, process_images=True, keep_images_inline
         return None
 
     print(f"Running AlcheMark AI extraction (process_images={process_images}, keep_images_inline={keep_images_inline})...")
-    combined_markdown_parts = []
     try:
         # alchemark_results is a list of FormattedResult objects (or dict-like objects)
         alchemark_results = alchemark_pdf2md(
@@ -200,21 +470,11 @@ def extract_markdown_alchemark(pdf_path, process_images=True, keep_images_inline
             print(f"AlcheMark AI returned no results for {pdf_path}.")
             return "" # Return empty string for consistency (successful run, no content)
 
-        for page_result in alchemark_results:
-            # Accessing attributes as per AlcheMark documentation
-            page_num = page_result.metadata.page
-            page_text = page_result.text
-
-            header = f"\n\n--- AlcheMark AI: Page {page_num} ---\n\n"
-            combined_markdown_parts.append(header)
-            combined_markdown_parts.append(page_text)
-
-            # Optional: Log more details from AlcheMark's rich output
-            # print(f"AlcheMark - Page {page_num}: {len(page_result.elements.tables)} tables, "
-            #       f"{len(page_result.elements.images)} images, "
-            #       f"{page_result.tokens} tokens, lang: {page_result.language}")
-
-        return "".join(combined_markdown_parts).strip()
+        # Accessing attributes as per AlcheMark documentation; str.join sizes the result in one pass
+        return "\n\n".join(
+            f"--- AlcheMark AI: Page {page_result.metadata.page} ---\n\n{page_result.text}"
+            for page_result in alchemark_results
+        ).strip()
 
     except Exception as e:
         print(f"Error processing {pdf_path} with AlcheMark AI: {e}")
@@ -225,152 +485,383 @@ def extract_markdown_alchemark(pdf_path, process_images=True, keep_images_inline
 
 # --- Main Pipeline Function ---
 
-EXTRACTION_METHODS = {
-    "pypdf": extract_text_pypdf,
-    "pymupdf": extract_text_pymupdf,
-    "pypdf_visitor": extract_text_pypdf_visitor,
-    "ocr": extract_text_ocr,
-    "unstructured_fast": lambda p: extract_text_unstructured(p, strategy="fast"),
-    "unstructured_ocr": lambda p: extract_text_unstructured(p, strategy="ocr_only"),
-    # "unstructured_hires": lambda p: extract_text_unstructured(p, strategy="hi_res"),
-    "pymupdf4llm": extract_markdown_pymupdf4llm,
-    "alchemark": lambda p: extract_markdown_alchemark(p, process_images=True, keep_images_inline=True),
+# method name -> (extraction function, dependencies available, missing dependency description)
+METHOD_REGISTRY = {
+    "pypdf": (extract_text_pypdf, True, None),
+    "pymupdf": (extract_text_pymupdf, True, None),
+    "pypdf_visitor": (extract_text_pypdf_visitor, True, None),
+    "ocr": (extract_text_ocr, PYTESSERACT_AVAILABLE, "pytesseract/pdf2image not installed"),
+    "unstructured_fast": (lambda p: extract_text_unstructured(p, strategy="fast"),
+                          UNSTRUCTURED_AVAILABLE, "unstructured not installed"),
+    "unstructured_ocr": (lambda p, images=None: extract_text_unstructured(p, strategy="ocr_only", images=images),
+                         UNSTRUCTURED_AVAILABLE, "unstructured not installed"),
+    # "unstructured_hires": (lambda p: extract_text_unstructured(p, strategy="hi_res"),
+    #                        UNSTRUCTURED_AVAILABLE, "unstructured not installed"),
+    "pymupdf4llm": (extract_markdown_pymupdf4llm, PYMUPDF4LLM_AVAILABLE, "pymupdf4llm not installed"),
+    "alchemark": (lambda p: extract_markdown_alchemark(p, process_images=True, keep_images_inline=True),
+                  ALCHEMARK_AVAILABLE, "alchemark-ai not installed"),
 }
 
+EXTRACTION_METHODS = {name: entry[0] for name, entry in METHOD_REGISTRY.items()}
+
 # List of methods known to produce Markdown output
 MARKDOWN_OUTPUT_METHODS = ["pymupdf4llm", "alchemark"]
 
-def run_pdf_extraction_pipeline(pdf_path, methods_to_test, output_dir="pdf_extraction_results"):
-    if not os.path.exists(pdf_path):
+# Methods whose extractor accepts the already-read PDF bytes (parsed in memory)
+IN_MEMORY_METHODS = ["pypdf", "pymupdf", "pypdf_visitor", "pymupdf4llm"]
+
+# Methods that OCR page images; when several are queued the pages are rendered once and shared
+OCR_IMAGE_METHODS = ["ocr", "unstructured_ocr"]
+
+# Methods that only read the embedded text layer; skipped up front for image-only PDFs
+TEXT_LAYER_METHODS = ["pypdf", "pymupdf", "pypdf_visitor"]
+
+# Bump when an extractor's output changes so stale cache entries are ignored
+EXTRACTION_CACHE_VERSION = 12
+
+def _output_extension(method_name):
+    return 'md' if method_name in MARKDOWN_OUTPUT_METHODS else 'txt'
+
+def _hash_pdf(pdf_bytes):
+    """Returns a blake2b hex digest of the PDF bytes, used as the cache key."""
+    return hashlib.blake2b(pdf_bytes, digest_size=16).hexdigest()
+
+def _cache_path(cache_dir, pdf_hash, method_name):
+    return os.path.join(cache_dir, f"{pdf_hash}_{method_name}_v{EXTRACTION_CACHE_VERSION}.{_output_extension(method_name)}")
+
+def _restore_from_cache(cached_filepath, output_filepath):
+    """Hardlinks a cached output into the run directory, copying if linking is not possible."""
+    if os.path.exists(output_filepath):
+        # Runs started in the same second share a directory; the target may already be this cache entry
+        if os.path.samefile(cached_filepath, output_filepath):
+            return
+        os.remove(output_filepath)
+    try:
+        os.link(cached_filepath, output_filepath)
+    except OSError:
+        shutil.copyfile(cached_filepath, output_filepath)
+
+def _write_atomic(filepath, content):
+    """Writes text to filepath via a temporary file so readers never see a partial output."""
+    tmp_filepath = f"{filepath}.tmp"
+    with open(tmp_filepath, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_filepath, filepath)
+
+def _store_in_cache(output_filepath, cached_filepath):
+    """Copies a fresh output file into the cache atomically."""
+    tmp_filepath = f"{cached_filepath}.{os.getpid()}.tmp"
+    try:
+        shutil.copyfile(output_filepath, tmp_filepath)
+        os.replace(tmp_filepath, cached_filepath)
+    except OSError as e:
+        print(f"Warning: could not write cache entry {cached_filepath}: {e}")
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
+
+def _run_single_method(method_name, pdf_path, method_output_dir, pdf_bytes=None, image_paths=None):
+    """
+    Runs a single extraction method and writes its output file.
+    Top-level so it can be pickled and dispatched to a worker process.
+    Dependency availability is checked by the caller before dispatch.
+    Returns the result dict for the summary.
+    """
+    print(f"\nRunning method: {method_name}...")
+    start_time = time.time()
+    output_content = None
+    success = False
+    error_message = ""
+
+    try:
+        extraction_func = METHOD_REGISTRY[method_name][0]
+        kwargs = {}
+        if pdf_bytes is not None and method_name in IN_MEMORY_METHODS:
+            kwargs["pdf_bytes"] = pdf_bytes
+        if image_paths is not None and method_name in OCR_IMAGE_METHODS:
+            kwargs["images"] = image_paths
+        output_content = extraction_func(pdf_path, **kwargs)
+        if output_content is not None:
+            if isinstance(output_content, str) and output_content.strip():
+                success = True
+            elif isinstance(output_content, str) and not output_content.strip():
+                 success = True
+                 print(f"Warning: Method '{method_name}' produced empty output.")
+            else:
+                 error_message = f"Extraction function for '{method_name}' returned non-string, non-None type: {type(output_content)}"
+                 print(f"Warning: {error_message}")
+                 output_content = str(output_content)
+                 success = False
+        else:
+             error_message = f"Extraction function for '{method_name}' returned None."
+             print(f"Info: {error_message}")
+    except Exception as e:
+        error_message = f"Unexpected error during '{method_name}' execution: {e}"
+        print(error_message)
+        import traceback
+        traceback.print_exc()
+        success = False
+
+    end_time = time.time()
+    time_taken = end_time - start_time
+    output_filename = f"{method_name}.{_output_extension(method_name)}"
+    output_filepath = os.path.join(method_output_dir, output_filename)
+
+    if success and output_content is not None:
+         if not isinstance(output_content, str):
+             print(f"Internal Warning: Output for '{method_name}' was not string before write. Converting.")
+             output_content = str(output_content)
+         try:
+            _write_atomic(output_filepath, output_content)
+            print(f"Success! Time taken: {time_taken:.2f} seconds. Output saved to: {output_filepath}")
+         except Exception as e_write:
+             print(f"Error writing output file {output_filepath}: {e_write}")
+             success = False
+             error_message += f" | File write error: {e_write}"
+             output_filepath = None
+    else:
+         if not error_message:
+             error_message = f"Method '{method_name}' did not produce valid output or failed silently."
+         print(f"Failed! Time taken: {time_taken:.2f} seconds. Error details logged above.")
+         output_filepath = None
+
+    return {
+        "output_file": output_filepath,
+        "time_taken": time_taken,
+        "success": success,
+        "error": error_message if not success else ""
+    }
+
+def _is_image_only_pdf(pdf_bytes):
+    """Probes the first pages with PyMuPDF; any parse error is treated as 'not image-only'."""
+    try:
+        doc = fitz.open(stream=pdf_bytes, filetype='pdf')
+        try:
+            return _looks_image_only(_pymupdf_probe_text(doc))
+        finally:
+            doc.close()
+    except Exception as e:
+        print(f"Warning: could not probe PDF text layer: {e}")
+        return False
+
+def _write_summary(summary_filepath, results):
+    """Rewrites the summary JSON atomically so a crash mid-run leaves the last complete summary."""
+    tmp_filepath = f"{summary_filepath}.tmp"
+    if ORJSON_AVAILABLE:
+        with open(tmp_filepath, 'wb') as f_summary:
+            f_summary.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+    else:
+        with open(tmp_filepath, 'w', encoding='utf-8') as f_summary:
+            json.dump(results, f_summary, indent=2)
+    os.replace(tmp_filepath, summary_filepath)
+
+def iter_pdf_extraction_pipeline(pdf_path, methods_to_test, output_dir="pdf_extraction_results",
+                                 cache_dir=None, force_refresh=False, progress_callback=None):
+    """
+    Runs each requested extraction method on the PDF and yields (method_name, result) as each one finishes.
+    The summary JSON is rewritten after every result, so earlier results survive if a later method crashes.
+    Outputs are cached in cache_dir (default: <output_dir>/.cache) keyed by the PDF content hash;
+    pass force_refresh=True to ignore cached entries and re-run every method.
+    progress_callback(method_name, result) is called for each result before it is yielded.
+    Yields nothing if the input PDF or the output directory cannot be set up.
+    """
+    # Read once; pypdf/PyMuPDF parse these bytes in memory and the cache key is derived from them.
+    # Opening directly doubles as the existence check, so no separate stat is needed.
+    try:
+        with open(pdf_path, 'rb') as f:
+            pdf_bytes = f.read()
+    except FileNotFoundError:
         print(f"Error: Input PDF not found at {pdf_path}")
-        return None
+        return
+    except OSError as e:
+        print(f"Error reading input PDF {pdf_path}: {e}")
+        return
 
     safe_pdf_name = re.sub(r'[\\/*?:"<>|]', '_', os.path.basename(pdf_path))
     base_filename = os.path.splitext(safe_pdf_name)[0]
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     method_output_dir = os.path.join(output_dir, f"{base_filename}_{timestamp}")
 
-    if not os.path.exists(method_output_dir):
+    try:
+        os.makedirs(method_output_dir, exist_ok=True)
+        print(f"Using output directory: {method_output_dir}")
+    except OSError as e:
+        print(f"Error creating output directory {method_output_dir}: {e}")
+        method_output_dir = output_dir
         try:
-            os.makedirs(method_output_dir)
-            print(f"Created output directory: {method_output_dir}")
-        except OSError as e:
-            print(f"Error creating output directory {method_output_dir}: {e}")
-            method_output_dir = output_dir
-            if not os.path.exists(method_output_dir):
-                 try:
-                     os.makedirs(method_output_dir)
-                 except OSError as e_fallback:
-                      print(f"Error creating fallback output directory {method_output_dir}: {e_fallback}")
-                      return None
+            os.makedirs(method_output_dir, exist_ok=True)
+        except OSError as e_fallback:
+            print(f"Error creating fallback output directory {method_output_dir}: {e_fallback}")
+            return
 
     results = {}
+    summary_filename = f"summary_{base_filename}_{timestamp}.json"
+    summary_filepath = os.path.join(output_dir, summary_filename)
+
+    def record(method_name, result):
+        results[method_name] = result
+        try:
+            _write_summary(summary_filepath, results)
+        except Exception as e_json:
+            print(f"\nError saving summary JSON file {summary_filepath}: {e_json}")
+        if progress_callback is not None:
+            progress_callback(method_name, result)
+
     print(f"\n--- Starting Extraction Pipeline for: {pdf_path} ---")
     print(f"--- Results will be saved in: {method_output_dir} ---")
 
+    if cache_dir is None:
+        cache_dir = os.path.join(output_dir, ".cache")
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        pdf_hash = _hash_pdf(pdf_bytes)
+    except OSError as e:
+        print(f"Warning: caching disabled ({e})")
+        pdf_hash = None
+
+    image_only = any(m in TEXT_LAYER_METHODS for m in methods_to_test) and _is_image_only_pdf(pdf_bytes)
+    if image_only:
+        print("Info: no text layer found on the first pages (image-only PDF); text-layer methods will be skipped.")
+
+    runnable_methods = []
     for method_name in methods_to_test:
-        if method_name not in EXTRACTION_METHODS:
+        if method_name not in METHOD_REGISTRY:
             print(f"Warning: Method '{method_name}' not recognized. Skipping.")
             continue
-
-        # Availability checks
-        if method_name == "ocr" and not PYTESSERACT_AVAILABLE:
-             print(f"Skipping '{method_name}': Dependencies not met.")
-             results[method_name] = {"output_file": None, "time_taken": 0, "success": False, "error": "Dependencies not met"}
-             continue
-        if method_name.startswith("unstructured") and not UNSTRUCTURED_AVAILABLE:
-             print(f"Skipping '{method_name}': Dependency (unstructured) not met.")
-             results[method_name] = {"output_file": None, "time_taken": 0, "success": False, "error": "Dependencies not met"}
-             continue
-        if method_name == "pymupdf4llm" and not PYMUPDF4LLM_AVAILABLE:
-             print(f"Skipping '{method_name}': Dependency (pymupdf4llm) not met.")
-             results[method_name] = {"output_file": None, "time_taken": 0, "success": False, "error": "Dependencies not met"}
-             continue
-        if method_name.startswith("alchemark") and not ALCHEMARK_AVAILABLE: # Check for AlcheMark
-             print(f"Skipping '{method_name}': Dependency (alchemark-ai) not met.")
-             results[method_name] = {"output_file": None, "time_taken": 0, "success": False, "error": "Dependencies not met"}
-             continue
-
-        print(f"\nRunning method: {method_name}...")
-        start_time = time.time()
-        output_content = None
-        success = False
-        error_message = ""
-
+        _, available, dep_error = METHOD_REGISTRY[method_name]
+        if not available:
+            print(f"Skipping '{method_name}': Dependencies not met ({dep_error}).")
+            record(method_name, {"output_file": None, "time_taken": 0, "success": False,
+                                 "error": f"Dependencies not met: {dep_error}", "cached": False})
+            yield method_name, results[method_name]
+            continue
+        if image_only and method_name in TEXT_LAYER_METHODS:
+            print(f"Skipping '{method_name}': PDF is image-only.")
+            record(method_name, {"output_file": None, "time_taken": 0, "success": False, "skipped": True,
+                                 "error": "Skipped: no text layer (image-only PDF); use an OCR method", "cached": False})
+            yield method_name, results[method_name]
+            continue
+        if pdf_hash and not force_refresh:
+            cached_filepath = _cache_path(cache_dir, pdf_hash, method_name)
+            if os.path.exists(cached_filepath):
+                output_filepath = os.path.join(method_output_dir, f"{method_name}.{_output_extension(method_name)}")
+                try:
+                    _restore_from_cache(cached_filepath, output_filepath)
+                    print(f"Using cached output for '{method_name}': {output_filepath}")
+                    record(method_name, {"output_file": output_filepath, "time_taken": 0, "success": True, "error": "", "cached": True})
+                    yield method_name, results[method_name]
+                    continue
+                except OSError as e:
+                    print(f"Warning: could not restore cached output for '{method_name}': {e}")
+        runnable_methods.append(method_name)
+
+    if runnable_methods:
+        # Render pages once when several OCR methods would otherwise each rasterize the PDF.
+        # The render runs on a thread while the other methods are already working in the pool;
+        # the OCR methods are submitted once it finishes.
+        shared_ocr_methods = []
+        if PYTESSERACT_AVAILABLE and sum(m in OCR_IMAGE_METHODS for m in runnable_methods) > 1:
+            shared_ocr_methods = [m for m in runnable_methods if m in OCR_IMAGE_METHODS]
+        shared_tmp = tempfile.TemporaryDirectory() if shared_ocr_methods else None
+        render_pool = ThreadPoolExecutor(max_workers=1) if shared_ocr_methods else None
+        # Cache copies run in the background so collecting the next result is not blocked on disk I/O
+        write_pool = ThreadPoolExecutor(max_workers=2)
+        write_futures = []
         try:
-            extraction_func = EXTRACTION_METHODS[method_name]
-            output_content = extraction_func(pdf_path)
-            if output_content is not None:
-                if isinstance(output_content, str) and output_content.strip():
-                    success = True
-                elif isinstance(output_content, str) and not output_content.strip():
-                     success = True
-                     print(f"Warning: Method '{method_name}' produced empty output.")
-                else:
-                     error_message = f"Extraction function for '{method_name}' returned non-string, non-None type: {type(output_content)}"
-                     print(f"Warning: {error_message}")
-                     output_content = str(output_content)
-                     success = False
-            else:
-                 error_message = f"Extraction function for '{method_name}' returned None."
-                 print(f"Info: {error_message}")
-        except Exception as e:
-            error_message = f"Unexpected error during '{method_name}' execution: {e}"
-            print(error_message)
-            import traceback
-            traceback.print_exc()
-            success = False
-
-        end_time = time.time()
-        time_taken = end_time - start_time
-        file_extension = 'md' if method_name in MARKDOWN_OUTPUT_METHODS else 'txt'
-        output_filename = f"{method_name}.{file_extension}"
-        output_filepath = os.path.join(method_output_dir, output_filename)
-
-        if success and output_content is not None:
-             if not isinstance(output_content, str):
-                 print(f"Internal Warning: Output for '{method_name}' was not string before write. Converting.")
-                 output_content = str(output_content)
-             try:
-                with open(output_filepath, "w", encoding="utf-8") as f:
-                    f.write(output_content)
-                print(f"Success! Time taken: {time_taken:.2f} seconds. Output saved to: {output_filepath}")
-             except Exception as e_write:
-                 print(f"Error writing output file {output_filepath}: {e_write}")
-                 success = False
-                 error_message += f" | File write error: {e_write}"
-                 output_filepath = None
-        else:
-             if not error_message:
-                 error_message = f"Method '{method_name}' did not produce valid output or failed silently."
-             print(f"Failed! Time taken: {time_taken:.2f} seconds. Error details logged above.")
-             output_filepath = None
-
-        results[method_name] = {
-            "output_file": output_filepath,
-            "time_taken": time_taken,
-            "success": success,
-            "error": error_message if not success else ""
-        }
+            max_workers = min(len(runnable_methods), os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                def submit(method_name, image_paths=None):
+                    return executor.submit(
+                        _run_single_method, method_name, pdf_path, method_output_dir,
+                        pdf_bytes if method_name in IN_MEMORY_METHODS else None,
+                        image_paths if method_name in OCR_IMAGE_METHODS else None,
+                    )
+
+                futures = {
+                    submit(method_name): method_name
+                    for method_name in runnable_methods if method_name not in shared_ocr_methods
+                }
+                pending = set(futures)
+                render_future = None
+                if shared_ocr_methods:
+                    print(f"Rendering pages once for OCR methods at {OCR_DPI} DPI...")
+                    render_future = render_pool.submit(_render_pdf_pages, pdf_path, shared_tmp.name)
+                    pending.add(render_future)
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future is render_future:
+                            try:
+                                image_paths = future.result()
+                            except Exception as e:
+                                print(f"Warning: shared page rendering failed ({e}); OCR methods will render individually.")
+                                image_paths = None
+                            for method_name in shared_ocr_methods:
+                                try:
+                                    ocr_future = submit(method_name, image_paths)
+                                except Exception as e:
+                                    # Pool broken by an earlier worker dying (e.g. OOM); record instead of raising
+                                    error_message = f"Worker for '{method_name}' could not be started: {e}"
+                                    print(error_message)
+                                    result = {"output_file": None, "time_taken": 0, "success": False,
+                                              "error": error_message, "cached": False}
+                                    record(method_name, result)
+                                    yield method_name, result
+                                    continue
+                                futures[ocr_future] = method_name
+                                pending.add(ocr_future)
+                            continue
+                        method_name = futures[future]
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            # Worker process died (e.g. OOM) or result could not be unpickled
+                            error_message = f"Worker for '{method_name}' failed: {e}"
+                            print(error_message)
+                            result = {"output_file": None, "time_taken": 0, "success": False, "error": error_message}
+                        result["cached"] = False
+                        if pdf_hash and result["success"] and result["output_file"]:
+                            write_futures.append(write_pool.submit(
+                                _store_in_cache, result["output_file"], _cache_path(cache_dir, pdf_hash, method_name)))
+                        record(method_name, result)
+                        yield method_name, result
+            for write_future in write_futures:
+                try:
+                    write_future.result()
+                except Exception as e_cache:
+                    # Cache writes are best-effort; the output file itself is already in place
+                    print(f"Warning: cache write failed: {e_cache}")
+        finally:
+            write_pool.shutdown(wait=True)
+            if render_pool is not None:
+                render_pool.shutdown(wait=True)
+            if shared_tmp is not None:
+                shared_tmp.cleanup()
 
     print("\n--- Extraction Pipeline Finished ---")
+    if results:
+        print(f"\nSummary results saved to: {summary_filepath}")
+
+def run_pdf_extraction_pipeline(pdf_path, methods_to_test, output_dir="pdf_extraction_results",
+                                cache_dir=None, force_refresh=False, progress_callback=None):
+    """
+    Runs the whole pipeline and returns {method_name: result}, or None if nothing could be run.
+    See iter_pdf_extraction_pipeline for the arguments and to consume results as they complete.
+    """
+    results = dict(iter_pdf_extraction_pipeline(
+        pdf_path, methods_to_test, output_dir=output_dir,
+        cache_dir=cache_dir, force_refresh=force_refresh, progress_callback=progress_callback,
+    ))
+    if not results:
+        return None
+
     print("\nSummary:")
     for method in sorted(results.keys()):
         result = results[method]
-        status = "Success" if result['success'] else "Failed"
+        status = "Success" if result['success'] else ("Skipped" if result.get('skipped') else "Failed")
         error_info = f" | Error: {result['error']}" if not result['success'] else ""
         file_info = f"| Output: {result['output_file']}" if result['output_file'] else "| No output file"
         print(f"- {method}: {status} ({result['time_taken']:.2f}s) {file_info} {error_info}")
 
-    summary_filename = f"summary_{base_filename}_{timestamp}.json"
-    summary_filepath = os.path.join(output_dir, summary_filename)
-    try:
-        with open(summary_filepath, 'w', encoding='utf-8') as f_summary:
-            json.dump(results, f_summary, indent=4)
-        print(f"\nSummary results saved to: {summary_filepath}")
-    except Exception as e_json:
-        print(f"\nError saving summary JSON file {summary_filepath}: {e_json}")
-
     return results
 
 # --- Example Usage ---